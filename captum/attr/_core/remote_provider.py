@@ -12,6 +12,8 @@ class RemoteLLMProvider(ABC):
     """All remote LLM providers that offer logprob via API
     (like vLLM) extends this class."""
 
+    __slots__ = ()
+
     api_url: str
 
     @abstractmethod
@@ -61,14 +61,16 @@ def assertTensorAlmostEqual(
                 torch.max(torch.abs(actual - expected)).item(), 0.0, delta=delta
             )
         else:
-            for index, (input, ref) in enumerate(zip(actual, expected)):
-                almost_equal = abs(input - ref) <= delta
-                if hasattr(almost_equal, "__iter__"):
-                    almost_equal = almost_equal.all()
-                assert (
-                    almost_equal
-                ), "Values at index {}, {} and {}, differ more than by {}".format(
-                    index, input, ref, delta
+            almost_equal = torch.abs(actual - expected) <= delta
+            if not almost_equal.all():
+                # report the first row along dim 0 that is out of tolerance
+                index = int(
+                    (~almost_equal).reshape(actual.shape[0], -1).any(dim=1).nonzero()[0]
+                )
+                raise AssertionError(
+                    "Values at index {}, {} and {}, differ more than by {}".format(
+                        index, actual[index], expected[index], delta
+                    )
                 )
     else:
         raise ValueError("Mode for assertion comparison must be one of `max` or `sum`.")
@@ -131,14 +133,29 @@ def lcg(
         yield x
 
 
+_lcg_stream: Generator[int, None, None] = lcg()
+_lcg_nums: Tensor = torch.empty(0, dtype=torch.float64)
+
+
+def _lcg_prefix(n: int) -> Tensor:
+    """First `n` numbers of `lcg()` scaled to [0, 1), as a float64 tensor.
+    The sequence is generated once and extended on demand."""
+    global _lcg_nums
+    if _lcg_nums.numel() < n:
+        missing = max(n, 2 * _lcg_nums.numel()) - _lcg_nums.numel()
+        nums = [next(_lcg_stream) / (1 << 32) for _ in range(missing)]
+        _lcg_nums = torch.cat([_lcg_nums, torch.tensor(nums, dtype=torch.float64)])
+    return _lcg_nums[:n]
+
+
 def rand_like(a: Tensor) -> Tensor:
     """Random tensors (for dependency-free version-agnostic reproducibility).
     PyTorch does not guarantee reproducible numbers across PyTorch releases,
     individual commits, or different platforms. See:
     https://pytorch.org/docs/stable/notes/randomness.html"""
-    g = lcg()
-    nums = [next(g) / (1 << 32) for _ in range(a.numel())]
-    return torch.tensor(nums, dtype=a.dtype, device=a.device).reshape(a.shape)
+    nums = _lcg_prefix(a.numel())
+    # copy so that callers never share storage with the cached sequence
+    return nums.to(dtype=a.dtype, device=a.device, copy=True).reshape(a.shape)
 
 
 class BaseTest(unittest.TestCase):
@@ -61,7 +61,14 @@ INSIGHTS_FILE_SUBDIRS = [
 
 TUTORIALS_REQUIRES = INSIGHTS_REQUIRES + ["torchtext", "torchvision"]
 
-TEST_REQUIRES = ["pytest", "pytest-cov", "parameterized", "flask", "flask-compress"]
+TEST_REQUIRES = [
+    "pytest",
+    "pytest-cov",
+    "pytest-xdist",
+    "parameterized",
+    "flask",
+    "flask-compress",
+]
 
 REMOTE_REQUIRES = ["openai"]
 
@@ -4,8 +4,9 @@
 
 from __future__ import print_function
 
+import functools
 import unittest
-from typing import cast, List, Tuple, Union
+from typing import Any, cast, List, Tuple, Type, Union
 
 import torch
 from captum.attr._core.layer.layer_deep_lift import LayerDeepLift, LayerDeepLiftShap
@@ -28,15 +29,63 @@ from captum.testing.helpers.basic_models import (
     ReLULinearModel,
 )
 from packaging import version
+from parameterized import parameterized
 from torch import Tensor
 
 
+@functools.lru_cache(maxsize=None)
+def _dl_inps() -> Tuple[Tuple[Tensor, Tensor], Tuple[Tensor, Tensor]]:
+    return create_inps_and_base_for_deeplift_neuron_layer_testing()
+
+
+@functools.lru_cache(maxsize=None)
+def _dl_shap_inps() -> Tuple[Tuple[Tensor, Tensor], Tuple[Tensor, Tensor]]:
+    return create_inps_and_base_for_deepliftshap_neuron_layer_testing()
+
+
 class TestDeepLift(BaseTest):
-    def test_relu_layer_deeplift(self) -> None:
-        model = ReLULinearModel(inplace=True)
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+    _relu_linear_inplace: ReLULinearModel
+    _relu_linear: ReLULinearModel
+    _multi_layer: BasicModel_MultiLayer
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # These models have fixed weights and none of the tests below mutate
+        # them, so a single instance per variant is shared across the class.
+        cls._relu_linear_inplace = ReLULinearModel(inplace=True)
+        cls._relu_linear = ReLULinearModel()
+        cls._multi_layer = BasicModel_MultiLayer(multi_input_module=True)
+        for model in (cls._relu_linear_inplace, cls._relu_linear, cls._multi_layer):
+            model.eval()
+            model.zero_grad()
+
+    def _inps_and_base(
+        self, attr_class: Type[LayerDeepLift] = LayerDeepLift
+    ) -> Tuple[Tuple[Tensor, ...], Tuple[Tensor, ...]]:
+        # the cached fixtures are shared, hand out fresh leaves to each test;
+        # only the inputs are differentiated, so baselines don't need grads
+        if issubclass(attr_class, LayerDeepLiftShap):
+            inps, base = _dl_shap_inps()
+        else:
+            inps, base = _dl_inps()
+        inputs = tuple(inp.detach().clone().requires_grad_(True) for inp in inps)
+        baselines = tuple(b.detach().clone() for b in base)
+        return inputs, baselines
+
+    @parameterized.expand(
+        [
+            ("deeplift", LayerDeepLift, True),
+            ("deepliftshap", LayerDeepLiftShap, False),
+        ]
+    )
+    def test_relu_layer_attribution(
+        self, _: str, attr_class: Type[LayerDeepLift], inplace: bool
+    ) -> None:
+        model = self._relu_linear_inplace if inplace else self._relu_linear
+        inputs, baselines = self._inps_and_base(attr_class)
 
-        layer_dl = LayerDeepLift(model, model.relu)
+        layer_dl = attr_class(model, model.relu)
         attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
             inputs,
             baselines,
@@ -46,11 +95,19 @@ class TestDeepLift(BaseTest):
         assertTensorAlmostEqual(self, attributions[0], [0.0, 15.0])
         assert_delta(self, delta)
 
-    def test_relu_layer_deeplift_wo_mutliplying_by_inputs(self) -> None:
-        model = ReLULinearModel(inplace=True)
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+    @parameterized.expand(
+        [
+            ("deeplift", LayerDeepLift, True),
+            ("deepliftshap", LayerDeepLiftShap, False),
+        ]
+    )
+    def test_relu_layer_attribution_wo_mutliplying_by_inputs(
+        self, _: str, attr_class: Type[LayerDeepLift], inplace: bool
+    ) -> None:
+        model = self._relu_linear_inplace if inplace else self._relu_linear
+        inputs, baselines = self._inps_and_base(attr_class)
 
-        layer_dl = LayerDeepLift(model, model.relu, multiply_by_inputs=False)
+        layer_dl = attr_class(model, model.relu, multiply_by_inputs=False)
         attributions = layer_dl.attribute(  # type: ignore[has-type]
             inputs,
             baselines,
@@ -58,11 +115,16 @@ class TestDeepLift(BaseTest):
         )
         assertTensorAlmostEqual(self, attributions[0], [0.0, 1.0])
 
-    def test_relu_layer_deeplift_multiple_output(self) -> None:
-        model = BasicModel_MultiLayer(multi_input_module=True)
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+    @parameterized.expand(
+        [("deeplift", LayerDeepLift), ("deepliftshap", LayerDeepLiftShap)]
+    )
+    def test_relu_layer_attribution_multiple_output(
+        self, _: str, attr_class: Type[LayerDeepLift]
+    ) -> None:
+        model = self._multi_layer
+        inputs, baselines = self._inps_and_base(attr_class)
 
-        layer_dl = LayerDeepLift(model, model.multi_relu)
+        layer_dl = attr_class(model, model.multi_relu)
         attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
             inputs[0],
             baselines[0],
@@ -76,8 +138,8 @@ class TestDeepLift(BaseTest):
         assert_delta(self, delta)
 
     def test_relu_layer_deeplift_add_args(self) -> None:
-        model = ReLULinearModel()
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+        model = self._relu_linear
+        inputs, baselines = self._inps_and_base()
 
         layer_dl = LayerDeepLift(model, model.relu)
         attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
@@ -90,24 +152,33 @@ class TestDeepLift(BaseTest):
         assertTensorAlmostEqual(self, attributions[0], [0.0, 45.0])
         assert_delta(self, delta)
 
-    def test_linear_layer_deeplift(self) -> None:
-        model = ReLULinearModel(inplace=True)
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+    @parameterized.expand(
+        [("deeplift", LayerDeepLift), ("deepliftshap", LayerDeepLiftShap)]
+    )
+    def test_linear_layer_attribution(
+        self, _: str, attr_class: Type[LayerDeepLift]
+    ) -> None:
+        model = self._relu_linear_inplace
+        inputs, baselines = self._inps_and_base(attr_class)
 
-        layer_dl = LayerDeepLift(model, model.l3)
-        attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=True,
-            return_convergence_delta=True,
+        layer_dl = attr_class(model, model.l3)
+        (attr_in, delta_in), (attr_out, delta_out) = self._attribute_both_sides(
+            layer_dl, inputs, baselines
         )
-        assertTensorAlmostEqual(self, attributions[0], [0.0, 15.0])
-        assert_delta(self, delta)
-
-    def test_relu_deeplift_with_custom_attr_func(self) -> None:
-        model = ReLULinearModel()
-        inputs, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
-        attr_method = LayerDeepLift(model, model.l3)
+        assertTensorAlmostEqual(self, attr_in[0], [0.0, 15.0])
+        assert_delta(self, delta_in)
+        assertTensorAlmostEqual(self, attr_out, [[15.0]])
+        assert_delta(self, delta_out)
+
+    @parameterized.expand(
+        [("deeplift", LayerDeepLift), ("deepliftshap", LayerDeepLiftShap)]
+    )
+    def test_relu_attribution_with_custom_attr_func(
+        self, _: str, attr_class: Type[LayerDeepLift]
+    ) -> None:
+        model = self._relu_linear
+        inputs, baselines = self._inps_and_base(attr_class)
+        attr_method = attr_class(model, model.l3)
         self._relu_custom_attr_func_assert(attr_method, inputs, baselines, [[2.0]])
 
     def test_inplace_maxpool_relu_with_custom_attr_func(self) -> None:
@@ -126,8 +197,8 @@ class TestDeepLift(BaseTest):
         )
 
     def test_linear_layer_deeplift_batch(self) -> None:
-        model = ReLULinearModel(inplace=True)
-        _, baselines = create_inps_and_base_for_deeplift_neuron_layer_testing()
+        model = self._relu_linear_inplace
+        _, baselines = self._inps_and_base()
         x1 = torch.tensor(
             [[-10.0, 1.0, -5.0], [-10.0, 1.0, -5.0], [-10.0, 1.0, -5.0]],
             requires_grad=True,
@@ -138,106 +209,13 @@ class TestDeepLift(BaseTest):
         inputs = (x1, x2)
 
         layer_dl = LayerDeepLift(model, model.l3)
-        attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=True,
-            return_convergence_delta=True,
+        (attr_in, delta_in), (attr_out, delta_out) = self._attribute_both_sides(
+            layer_dl, inputs, baselines
         )
-        assertTensorAlmostEqual(self, attributions[0], [0.0, 15.0])
-        assert_delta(self, delta)
-
-        attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=False,
-            return_convergence_delta=True,
-        )
-        assertTensorAlmostEqual(self, attributions, [[15.0], [15.0], [15.0]])
-        assert_delta(self, delta)
-
-    def test_relu_layer_deepliftshap(self) -> None:
-        model = ReLULinearModel()
-        (
-            inputs,
-            baselines,
-        ) = create_inps_and_base_for_deepliftshap_neuron_layer_testing()
-        layer_dl_shap = LayerDeepLiftShap(model, model.relu)
-        attributions, delta = layer_dl_shap.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=True,
-            return_convergence_delta=True,
-        )
-        assertTensorAlmostEqual(self, attributions[0], [0.0, 15.0])
-        assert_delta(self, delta)
-
-    def test_relu_layer_deepliftshap_wo_mutliplying_by_inputs(self) -> None:
-        model = ReLULinearModel()
-        (
-            inputs,
-            baselines,
-        ) = create_inps_and_base_for_deepliftshap_neuron_layer_testing()
-        layer_dl_shap = LayerDeepLiftShap(model, model.relu, multiply_by_inputs=False)
-        attributions = layer_dl_shap.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=True,
-        )
-        assertTensorAlmostEqual(self, attributions[0], [0.0, 1.0])
-
-    def test_relu_layer_deepliftshap_multiple_output(self) -> None:
-        model = BasicModel_MultiLayer(multi_input_module=True)
-        (
-            inputs,
-            baselines,
-        ) = create_inps_and_base_for_deepliftshap_neuron_layer_testing()
-
-        layer_dl = LayerDeepLiftShap(model, model.multi_relu)
-        attributions, delta = layer_dl.attribute(  # type: ignore[has-type]
-            inputs[0],
-            baselines[0],
-            target=0,
-            attribute_to_layer_input=False,
-            return_convergence_delta=True,
-        )
-        assertTensorTuplesAlmostEqual(
-            self, attributions, ([[0.0, -1.0, -1.0, -1.0]], [[0.0, -1.0, -1.0, -1.0]])
-        )
-        assert_delta(self, delta)
-
-    def test_linear_layer_deepliftshap(self) -> None:
-        model = ReLULinearModel(inplace=True)
-        (
-            inputs,
-            baselines,
-        ) = create_inps_and_base_for_deepliftshap_neuron_layer_testing()
-        layer_dl_shap = LayerDeepLiftShap(model, model.l3)
-        attributions, delta = layer_dl_shap.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=True,
-            return_convergence_delta=True,
-        )
-        assertTensorAlmostEqual(self, attributions[0], [0.0, 15.0])
-        assert_delta(self, delta)
-        attributions, delta = layer_dl_shap.attribute(  # type: ignore[has-type]
-            inputs,
-            baselines,
-            attribute_to_layer_input=False,
-            return_convergence_delta=True,
-        )
-        assertTensorAlmostEqual(self, attributions, [[15.0]])
-        assert_delta(self, delta)
-
-    def test_relu_deepliftshap_with_custom_attr_func(self) -> None:
-        model = ReLULinearModel()
-        (
-            inputs,
-            baselines,
-        ) = create_inps_and_base_for_deepliftshap_neuron_layer_testing()
-        attr_method = LayerDeepLiftShap(model, model.l3)
-        self._relu_custom_attr_func_assert(attr_method, inputs, baselines, [[2.0]])
+        assertTensorAlmostEqual(self, attr_in[0], [0.0, 15.0])
+        assert_delta(self, delta_in)
+        assertTensorAlmostEqual(self, attr_out, [[15.0], [15.0], [15.0]])
+        assert_delta(self, delta_out)
 
     def test_lin_maxpool_lin_classification(self) -> None:
         inputs = torch.ones(2, 4)
@@ -288,6 +266,31 @@ class TestDeepLift(BaseTest):
         )
         self.assertTrue(cast(Tensor, attr).sum() == cast(Tensor, attr2).sum())
 
+    def _attribute_both_sides(
+        self,
+        attr_method: Union[LayerDeepLift, LayerDeepLiftShap],
+        inputs: Union[Tensor, Tuple[Tensor, ...]],
+        baselines: Union[Tensor, Tuple[Tensor, ...]],
+    ) -> Tuple[Tuple[Any, Tensor], Tuple[Any, Tensor]]:
+        # Attributes to the layer input and the layer output with the same
+        # attribution instance, returning `(attributions, delta)` for each side.
+        # Both sides go through `attribute` so that the
+        # `attribute_to_layer_input` code paths are exercised separately.
+        return (
+            attr_method.attribute(  # type: ignore[has-type]
+                inputs,
+                baselines,
+                attribute_to_layer_input=True,
+                return_convergence_delta=True,
+            ),
+            attr_method.attribute(  # type: ignore[has-type]
+                inputs,
+                baselines,
+                attribute_to_layer_input=False,
+                return_convergence_delta=True,
+            ),
+        )
+
     def _relu_custom_attr_func_assert(
         self,
         attr_method: Union[LayerDeepLift, LayerDeepLiftShap],
@@ -313,7 +316,7 @@ class TestDeepLift(BaseTest):
                 "Skipping unused layed gradient test since it is not supported "
                 "by torch version < 2.1"
             )
-        model = BasicModel_MultiLayer(multi_input_module=True)
+        model = self._multi_layer
         inp = torch.tensor([[3.0, 4.0, 5.0]], requires_grad=True)
         dl = LayerDeepLift(model, model.relu)
         attributions = dl.attribute(  # type: ignore[has-type]
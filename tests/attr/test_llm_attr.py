@@ -2,12 +2,12 @@
 
 # pyre-strict
 
-import copy
+import functools
 
 from collections import UserDict
+from itertools import accumulate
 from typing import (
     Any,
-    cast,
     Dict,
     List,
     Literal,
@@ -21,6 +21,7 @@ from typing import (
 from unittest.mock import MagicMock, patch
 
 import torch
+import torch.nn.functional as F
 from captum._utils.models.linear_model import SkLearnLasso
 from captum._utils.typing import BatchEncodingType, TokenizerLike
 from captum.attr._core.feature_ablation import FeatureAblation
@@ -39,7 +40,11 @@ from captum.attr._core.shapley_value import ShapleyValues, ShapleyValueSampling
 from captum.attr._utils.attribution import GradientAttribution, PerturbationAttribution
 from captum.attr._utils.interpretable_input import TextTemplateInput, TextTokenInput
 from captum.testing.helpers import BaseTest
-from captum.testing.helpers.basic import assertTensorAlmostEqual, rand_like
+from captum.testing.helpers.basic import (
+    assertTensorAlmostEqual,
+    rand_like,
+    set_all_random_seeds,
+)
 from parameterized import parameterized, parameterized_class
 from torch import nn, Tensor
 
@@ -70,19 +75,26 @@ class DummyTokenizer:
         add_special_tokens: bool = True,
         return_tensors: Optional[str] = None,
     ) -> Union[List[int], Tensor]:
+        tokens_ids = list(self._encode_ids(text, add_special_tokens))
+
+        if return_tensors:
+            return torch.tensor([tokens_ids])
+        return tokens_ids
+
+    @classmethod
+    @functools.lru_cache(maxsize=512)
+    def _encode_ids(cls, text: str, add_special_tokens: bool) -> Tuple[int, ...]:
+        # the tokenizer is stateless, so encodings are cached across calls
         tokens = text.split(" ")
 
-        tokens_ids: Union[List[int], Tensor] = [
-            ord(s[0]) if len(s) == 1 else (self.sos if s == self.sos_str else self.unk)
+        tokens_ids = tuple(
+            ord(s[0]) if len(s) == 1 else (cls.sos if s == cls.sos_str else cls.unk)
             for s in tokens
-        ]
+        )
 
         # start with sos
         if add_special_tokens:
-            tokens_ids = [self.sos, *tokens_ids]
-
-        if return_tensors:
-            return torch.tensor([tokens_ids])
+            tokens_ids = (cls.sos, *tokens_ids)
         return tokens_ids
 
     @overload
@@ -99,10 +111,15 @@ class DummyTokenizer:
                 if token_ids in self.special_tokens
                 else chr(token_ids)
             )
-        return [
-            (self.special_tokens[tid] if tid in self.special_tokens else chr(tid))
+        return list(self._convert_ids_to_tokens(tuple(token_ids)))
+
+    @classmethod
+    @functools.lru_cache(maxsize=512)
+    def _convert_ids_to_tokens(cls, token_ids: Tuple[int, ...]) -> Tuple[str, ...]:
+        return tuple(
+            (cls.special_tokens[tid] if tid in cls.special_tokens else chr(tid))
             for tid in token_ids
-        ]
+        )
 
     @overload
     def convert_tokens_to_ids(self, tokens: str) -> int: ...
@@ -132,60 +149,148 @@ class DummyTokenizer:
         result["input_ids"] = input_ids
 
         if return_offsets_mapping:
-            offset_mapping = []
-            if add_special_tokens:
-                offset_mapping.append((0, 0))
-            idx = 0
-            for token in text.split(" "):
-                offset_mapping.append((idx - (0 if idx == 0 else 1), idx + len(token)))
-                idx += len(token) + 1  # +1 for space
+            lens = [len(token) for token in text.split(" ")]
+            # token start indices, +1 for each space
+            starts = accumulate((n + 1 for n in lens[:-1]), initial=0)
+            offset_mapping = [(0, 0)] if add_special_tokens else []
+            offset_mapping.extend(
+                (idx - (0 if idx == 0 else 1), idx + n) for idx, n in zip(starts, lens)
+            )
             result["offset_mapping"] = offset_mapping
 
         return result
 
 
+# DummyTokenizer is stateless, a single instance serves every test
+_SHARED_TOKENIZER = DummyTokenizer()
+
+# token ids of "m n o p q" with sos, shared as a tensor target since
+# attribution only reads it
+_MNOPQ_TARGET_IDS: Tensor = torch.tensor(_SHARED_TOKENIZER.encode("m n o p q"))
+
+
 class Result(NamedTuple):
     logits: Tensor
     past_key_values: Tensor
 
 
+class _TinyEncoderLayer(nn.Module):
+    """Post-norm encoder layer computing the same as ``nn.TransformerEncoderLayer``
+    with relu activation, written directly against its parameters."""
+
+    def __init__(
+        self,
+        d_model: int,
+        nhead: int,
+        dim_feedforward: int = 2048,
+        dropout: float = 0.1,
+    ) -> None:
+        super().__init__()
+        # submodules and their (random) initialization follow the order of
+        # nn.TransformerEncoderLayer, only the attention forward is bypassed
+        self.self_attn = nn.MultiheadAttention(
+            d_model, nhead, dropout=dropout, batch_first=True
+        )
+        self.linear1 = nn.Linear(d_model, dim_feedforward)
+        self.linear2 = nn.Linear(dim_feedforward, d_model)
+        self.norm1 = nn.LayerNorm(d_model)
+        self.norm2 = nn.LayerNorm(d_model)
+        self.nhead = nhead
+        self.dropout_p = dropout
+
+    def forward(self, x: Tensor) -> Tensor:
+        bsz, seq_len, d_model = x.shape
+        q, k, v = F.linear(
+            x, self.self_attn.in_proj_weight, self.self_attn.in_proj_bias
+        ).chunk(3, dim=-1)
+        q = q.view(bsz, seq_len, self.nhead, -1).transpose(1, 2)
+        k = k.view(bsz, seq_len, self.nhead, -1).transpose(1, 2)
+        v = v.view(bsz, seq_len, self.nhead, -1).transpose(1, 2)
+        # spelled out rather than F.scaled_dot_product_attention, which needs
+        # torch 2.0 while older releases are still supported
+        weights = torch.softmax(q @ k.transpose(-2, -1) * q.size(-1) ** -0.5, dim=-1)
+        weights = F.dropout(weights, self.dropout_p, self.training)
+        attn = (weights @ v).transpose(1, 2).reshape(bsz, seq_len, d_model)
+        out_proj = self.self_attn.out_proj
+        attn = F.linear(attn, out_proj.weight, out_proj.bias)
+        x = self.norm1(x + F.dropout(attn, self.dropout_p, self.training))
+
+        ff = F.linear(x, self.linear1.weight, self.linear1.bias)
+        ff = F.dropout(F.relu(ff), self.dropout_p, self.training)
+        ff = F.linear(ff, self.linear2.weight, self.linear2.bias)
+        return self.norm2(x + F.dropout(ff, self.dropout_p, self.training))
+
+
+class _DummyLLMCore(nn.Module):
+    """Everything of DummyLLM after the embedding, kept apart from the
+    embedding so it can be scripted while layer methods still hook ``emb``."""
+
+    def __init__(self, vocab_size: int, d_model: int) -> None:
+        super().__init__()
+        self.linear = nn.Linear(d_model, vocab_size)
+        self.trans = _TinyEncoderLayer(d_model=d_model, nhead=2)
+
+    def forward(
+        self, emb: Tensor, past_key_values: Optional[Tensor] = None
+    ) -> Tuple[Tensor, Tensor]:
+        if past_key_values is not None:
+            # a single cached prefix is shared by every row of a batched input
+            past_key_values = past_key_values.expand(emb.size(0), -1, -1)
+            emb = torch.cat((past_key_values, emb), dim=1)
+        encoding = self.trans(emb)
+        logits = F.linear(encoding, self.linear.weight, self.linear.bias)
+        return logits, emb
+
+
 class DummyLLM(nn.Module):
-    def __init__(self, deterministic_weights: bool = False) -> None:
+    def __init__(
+        self,
+        deterministic_weights: bool = False,
+        dtype: Optional[torch.dtype] = None,
+        script: bool = False,
+    ) -> None:
 
         super().__init__()
-        self.tokenizer = DummyTokenizer()
+        self._device = torch.device("cpu")
+        # encoded mock responses per (response, device, dtype)
+        self._response_ids: Dict[Tuple[str, torch.device, torch.dtype], Tensor] = {}
+        self.tokenizer = _SHARED_TOKENIZER
         self.emb = nn.Embedding(self.tokenizer.vocab_size, 10)
-        self.linear = nn.Linear(10, self.tokenizer.vocab_size)
-        self.trans = nn.TransformerEncoderLayer(d_model=10, nhead=2, batch_first=True)
+        core = _DummyLLMCore(self.tokenizer.vocab_size, 10)
         if deterministic_weights:
-            self.emb.weight.data = rand_like(self.emb.weight)
+            self.emb.weight.data.copy_(rand_like(self.emb.weight))
+
+            trans = core.trans
+            trans.eval()
 
-            self.trans.eval()
+            self_attn_in_weight = trans.self_attn.in_proj_weight
+            trans.self_attn.in_proj_weight.data.copy_(rand_like(self_attn_in_weight))
+            trans.self_attn.in_proj_bias.data.fill_(0.0)
 
-            self_attn_in_weight = self.trans.self_attn.in_proj_weight
-            self.trans.self_attn.in_proj_weight.data = rand_like(self_attn_in_weight)
-            self.trans.self_attn.in_proj_bias.data.fill_(0.0)
+            self_attn_out_weight = trans.self_attn.out_proj.weight
+            trans.self_attn.out_proj.weight.data.copy_(rand_like(self_attn_out_weight))
+            trans.self_attn.out_proj.bias.data.fill_(0.0)
 
-            self_attn_out_weight = self.trans.self_attn.out_proj.weight
-            self.trans.self_attn.out_proj.weight.data = rand_like(self_attn_out_weight)
-            self.trans.self_attn.out_proj.bias.data.fill_(0.0)
+            trans.linear1.weight.data.copy_(rand_like(trans.linear1.weight))
+            trans.linear1.bias.data.fill_(0.0)
 
-            self.trans.linear1.weight.data = rand_like(self.trans.linear1.weight)
-            self.trans.linear1.bias.data.fill_(0.0)
+            trans.linear2.weight.data.copy_(rand_like(trans.linear2.weight))
+            trans.linear2.bias.data.fill_(0.0)
 
-            self.trans.linear2.weight.data = rand_like(self.trans.linear2.weight)
-            self.trans.linear2.bias.data.fill_(0.0)
+            core.linear.weight.data.copy_(rand_like(core.linear.weight))
+            core.linear.bias.data.fill_(0.5)
 
-            self.linear.weight.data = rand_like(self.linear.weight)
-            self.linear.bias.data.fill_(0.5)
+        # the tiny tensors make per-op python dispatch the dominant cost of the
+        # forwards, scripting only pays off for models running thousands of them
+        self.core: nn.Module = torch.jit.script(core) if script else core
+
+        if dtype is not None:
+            self.to(dtype)
 
     def forward(self, input_ids: Tensor, *args: Any, **kwargs: Any) -> Result:
         emb = self.emb(input_ids)
-        if "past_key_values" in kwargs:
-            emb = torch.cat((kwargs["past_key_values"], emb), dim=1)
-        encoding = self.trans(emb)
-        logits = self.linear(encoding)
-        return Result(logits=logits, past_key_values=emb)
+        # the core already returns (logits, past_key_values) in Result's field order
+        return Result._make(self.core(emb, kwargs.get("past_key_values")))
 
     def generate(
         self,
@@ -195,16 +300,22 @@ class DummyLLM(nn.Module):
         **kwargs: Any,
     ) -> Tensor:
         assert mock_response, "must mock response to use DummyLLM to generate"
-        response = self.tokenizer.encode(mock_response)[1:]
-        return torch.cat(
-            [input_ids, torch.tensor([response], device=self.device)],  # type: ignore
-            dim=1,
-        )
+        key = (mock_response, input_ids.device, input_ids.dtype)
+        response = self._response_ids.get(key)
+        if response is None:
+            response = torch.as_tensor(
+                self.tokenizer.encode(mock_response)[1:],
+                dtype=input_ids.dtype,
+                device=input_ids.device,
+            ).unsqueeze(0)
+            self._response_ids[key] = response
+        return torch.cat([input_ids, response], dim=1)
 
     def _update_model_kwargs_for_generation(
         self, outputs: Result, model_kwargs: Dict[str, Any]
     ) -> Dict[str, Any]:
-        new_kwargs = copy.deepcopy(model_kwargs)
+        # only the past_key_values entry is replaced, the other values are shared
+        new_kwargs = dict(model_kwargs)
         if hasattr(outputs, "past_key_values"):
             new_kwargs["past_key_values"] = outputs.past_key_values
         return new_kwargs
@@ -226,9 +337,48 @@ class DummyLLM(nn.Module):
             }
         return {"input_ids": model_inp}
 
+    def _apply(self, *args: Any, **kwargs: Any) -> "DummyLLM":
+        # .to() / .cuda() / .cpu() all go through _apply, track the device here
+        # rather than looking it up on every generation step
+        super()._apply(*args, **kwargs)
+        self._device = next(self.parameters()).device
+        return self
+
     @property
     def device(self) -> torch.device:
-        return next(self.parameters()).device
+        return self._device
+
+
+# reference attributions of TestLLMAttr.test_llm_attr, the expected values of
+# ShapleyValueSampling and ShapleyValues are identical and share tensors
+_SHAPLEY_SEQ_ATTR = torch.tensor([0.0021, -0.0047, -0.0193, 0.0302])
+_SHAPLEY_TOK_ATTR = torch.tensor(
+    [
+        [0.0037, -0.0006, -0.0011, -0.0029],
+        [0.0005, 0.0002, -0.0134, 0.0081],
+        [0.0017, 0.0010, -0.0098, 0.0028],
+        [0.0100, -0.0021, 0.0025, 0.0087],
+        [-0.0138, -0.0031, 0.0025, 0.0134],
+    ]
+)
+_TRUE_SEQ_ATTR: Dict[Type[PerturbationAttribution], Tensor] = {
+    FeatureAblation: torch.tensor([-0.0007, -0.0031, -0.0126, 0.0102]),
+    ShapleyValueSampling: _SHAPLEY_SEQ_ATTR,
+    ShapleyValues: _SHAPLEY_SEQ_ATTR,
+}
+_TRUE_TOK_ATTR: Dict[Type[PerturbationAttribution], Tensor] = {
+    FeatureAblation: torch.tensor(
+        [
+            [0.0075, 0.0007, -0.0006, 0.0010],
+            [-0.0062, -0.0073, -0.0079, -0.0003],
+            [-0.0020, -0.0050, -0.0056, -0.0011],
+            [0.0113, 0.0034, 0.0006, 0.0047],
+            [-0.0112, 0.0050, 0.0009, 0.0058],
+        ]
+    ),
+    ShapleyValueSampling: _SHAPLEY_TOK_ATTR,
+    ShapleyValues: _SHAPLEY_TOK_ATTR,
+}
 
 
 @parameterized_class(
@@ -244,50 +394,32 @@ class TestLLMAttr(BaseTest):
     device: str
     # pyre-fixme[13]: Attribute `use_cached_outputs` is never initialized.
     use_cached_outputs: bool
+    _deterministic_llm: DummyLLM
+    _rng_state_after_init: Tensor
+    _template_inp: TextTemplateInput
+    _token_inp: TextTokenInput
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # attribution never updates the weights, so the deterministic model
+        # can be shared by every test of the class
+        set_all_random_seeds(1234)
+        cls._deterministic_llm = DummyLLM(deterministic_weights=True, script=True)
+        # the sampling based methods expect the rng state a freshly seeded test
+        # would have after building the model
+        cls._rng_state_after_init = torch.get_rng_state()
+        cls._deterministic_llm.to(cls.device)
+        cls._deterministic_llm.eval()
+        # interpretable inputs are not modified by attribution either
+        cls._template_inp = TextTemplateInput("{} b {} {} e {}", ["a", "c", "d", "f"])
+        cls._token_inp = TextTokenInput("a b c", _SHARED_TOKENIZER)
 
-    # pyre-fixme[56]: Pyre was not able to infer the type of argument `comprehension
     @parameterized.expand(
         [
-            (
-                AttrClass,
-                delta,
-                n_samples,
-                torch.tensor(true_seq_attr),
-                torch.tensor(true_tok_attr),
-            )
-            for AttrClass, delta, n_samples, true_seq_attr, true_tok_attr in zip(
-                (FeatureAblation, ShapleyValueSampling, ShapleyValues),  # AttrClass
-                (0.001, 0.001, 0.001),  # delta
-                (None, 1000, None),  # n_samples
-                (  # true_seq_attr
-                    [-0.0007, -0.0031, -0.0126, 0.0102],  # FeatureAblation
-                    [0.0021, -0.0047, -0.0193, 0.0302],  # ShapleyValueSampling
-                    [0.0021, -0.0047, -0.0193, 0.0302],  # ShapleyValues
-                ),
-                (  # true_tok_attr
-                    [  # FeatureAblation
-                        [0.0075, 0.0007, -0.0006, 0.0010],
-                        [-0.0062, -0.0073, -0.0079, -0.0003],
-                        [-0.0020, -0.0050, -0.0056, -0.0011],
-                        [0.0113, 0.0034, 0.0006, 0.0047],
-                        [-0.0112, 0.0050, 0.0009, 0.0058],
-                    ],
-                    [  # ShapleyValueSampling
-                        [0.0037, -0.0006, -0.0011, -0.0029],
-                        [0.0005, 0.0002, -0.0134, 0.0081],
-                        [0.0017, 0.0010, -0.0098, 0.0028],
-                        [0.0100, -0.0021, 0.0025, 0.0087],
-                        [-0.0138, -0.0031, 0.0025, 0.0134],
-                    ],
-                    [  # ShapleyValues
-                        [0.0037, -0.0006, -0.0011, -0.0029],
-                        [0.0005, 0.0002, -0.0134, 0.0081],
-                        [0.0017, 0.0010, -0.0098, 0.0028],
-                        [0.0100, -0.0021, 0.0025, 0.0087],
-                        [-0.0138, -0.0031, 0.0025, 0.0134],
-                    ],
-                ),
-            )
+            (FeatureAblation, 0.001, None),
+            (ShapleyValueSampling, 0.001, 1000),
+            (ShapleyValues, 0.001, None),
         ]
     )
     def test_llm_attr(
@@ -295,92 +427,99 @@ class TestLLMAttr(BaseTest):
         AttrClass: Type[PerturbationAttribution],
         delta: float,
         n_samples: Optional[int],
-        true_seq_attr: Tensor,
-        true_tok_attr: Tensor,
     ) -> None:
         attr_kws: Dict[str, int] = {}
         if n_samples is not None:
             attr_kws["n_samples"] = n_samples
 
-        llm = DummyLLM(deterministic_weights=True)
-        llm.to(self.device)
-        llm.eval()
-        tokenizer = DummyTokenizer()
+        llm = self._deterministic_llm
+        torch.set_rng_state(self._rng_state_after_init)
+        tokenizer = _SHARED_TOKENIZER
         llm_attr = LLMAttribution(AttrClass(llm), tokenizer)
 
-        inp = TextTemplateInput("{} b {} {} e {}", ["a", "c", "d", "f"])
-        res = llm_attr.attribute(
-            inp,
-            "m n o p q",
-            skip_tokens=[0],
-            use_cached_outputs=self.use_cached_outputs,
-            # pyre-fixme[6]: In call `LLMAttribution.attribute`,
-            # for 4th positional argument, expected
-            # `Optional[typing.Callable[..., typing.Any]]` but got `int`.
-            **attr_kws,  # type: ignore
-        )
+        inp = self._template_inp
+        with torch.inference_mode():
+            res = llm_attr.attribute(
+                inp,
+                "m n o p q",
+                skip_tokens=[0],
+                use_cached_outputs=self.use_cached_outputs,
+                # pyre-fixme[6]: In call `LLMAttribution.attribute`,
+                # for 4th positional argument, expected
+                # `Optional[typing.Callable[..., typing.Any]]` but got `int`.
+                **attr_kws,  # type: ignore
+            )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         self.assertEqual(res.seq_attr.shape, (4,))
-        self.assertEqual(cast(Tensor, res.token_attr).shape, (5, 4))
+        self.assertEqual(token_attr.shape, (5, 4))
         self.assertEqual(res.input_tokens, ["a", "c", "d", "f"])
         self.assertEqual(res.output_tokens, ["m", "n", "o", "p", "q"])
         self.assertEqual(res.seq_attr.device.type, self.device)
-        self.assertEqual(cast(Tensor, res.token_attr).device.type, self.device)
+        self.assertEqual(token_attr.device.type, self.device)
 
         assertTensorAlmostEqual(
             self,
             actual=res.seq_attr,
-            expected=true_seq_attr,
+            expected=_TRUE_SEQ_ATTR[AttrClass],
             delta=delta,
             mode="max",
         )
         assertTensorAlmostEqual(
             self,
-            actual=res.token_attr,
-            expected=true_tok_attr,
+            actual=token_attr,
+            expected=_TRUE_TOK_ATTR[AttrClass],
             delta=delta,
             mode="max",
         )
 
     def test_llm_attr_without_target(self) -> None:
-        llm = DummyLLM()
+        # only shapes are checked here, so bf16 precision is enough on cuda
+        llm = DummyLLM(dtype=torch.bfloat16 if self.device == "cuda" else None)
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         fa = FeatureAblation(llm)
         llm_fa = LLMAttribution(fa, tokenizer)
 
-        inp = TextTemplateInput("{} b {} {} e {}", ["a", "c", "d", "f"])
-        res = llm_fa.attribute(
-            inp,
-            gen_args={"mock_response": "x y z"},
-            use_cached_outputs=self.use_cached_outputs,
-        )
+        inp = self._template_inp
+        with torch.inference_mode():
+            res = llm_fa.attribute(
+                inp,
+                gen_args={"mock_response": "x y z"},
+                use_cached_outputs=self.use_cached_outputs,
+            )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         self.assertEqual(res.seq_attr.shape, (4,))
-        self.assertEqual(cast(Tensor, res.token_attr).shape, (3, 4))
+        self.assertEqual(token_attr.shape, (3, 4))
         self.assertEqual(res.input_tokens, ["a", "c", "d", "f"])
         self.assertEqual(res.output_tokens, ["x", "y", "z"])
         self.assertEqual(res.seq_attr.device.type, self.device)
-        self.assertEqual(cast(Tensor, res.token_attr).device.type, self.device)
+        self.assertEqual(token_attr.device.type, self.device)
 
     def test_llm_attr_fa_log_prob(self) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         fa = FeatureAblation(llm)
         llm_fa = LLMAttribution(fa, tokenizer, attr_target="log_prob")
 
-        inp = TextTemplateInput("{} b {} {} e {}", ["a", "c", "d", "f"])
-        res = llm_fa.attribute(
-            inp,
-            "m n o p q",
-            skip_tokens=[0],
-            use_cached_outputs=self.use_cached_outputs,
-        )
+        inp = self._template_inp
+        with torch.inference_mode():
+            res = llm_fa.attribute(
+                inp,
+                "m n o p q",
+                skip_tokens=[0],
+                use_cached_outputs=self.use_cached_outputs,
+            )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         # With FeatureAblation, the seq attr in log_prob
         # equals to the sum of each token attr
-        assertTensorAlmostEqual(self, res.seq_attr, cast(Tensor, res.token_attr).sum(0))
+        assertTensorAlmostEqual(self, res.seq_attr, token_attr.sum(0))
 
     # pyre-fixme[56]: Pyre was not able to infer the type of argument `comprehension
     @parameterized.expand(
@@ -419,21 +558,21 @@ class TestLLMAttr(BaseTest):
         if n_samples is not None:
             attr_kws["n_samples"] = n_samples
 
-        llm = DummyLLM(deterministic_weights=True)
-        llm.to(self.device)
-        llm.eval()
-        tokenizer = DummyTokenizer()
+        llm = self._deterministic_llm
+        torch.set_rng_state(self._rng_state_after_init)
+        tokenizer = _SHARED_TOKENIZER
         fa = AttrClass(llm, **init_kws)
         llm_fa = LLMAttribution(fa, tokenizer, attr_target="log_prob")
 
-        inp = TextTemplateInput("{} b {} {} e {}", ["a", "c", "d", "f"])
-        res = llm_fa.attribute(
-            inp,
-            "m n o p q",
-            skip_tokens=[0],
-            use_cached_outputs=self.use_cached_outputs,
-            **attr_kws,  # type: ignore
-        )
+        inp = self._template_inp
+        with torch.inference_mode():
+            res = llm_fa.attribute(
+                inp,
+                "m n o p q",
+                skip_tokens=[0],
+                use_cached_outputs=self.use_cached_outputs,
+                **attr_kws,  # type: ignore
+            )
 
         self.assertEqual(res.seq_attr.shape, (4,))
         self.assertEqual(res.seq_attr.device.type, self.device)
@@ -448,30 +587,20 @@ class TestLLMAttr(BaseTest):
             mode="max",
         )
 
-    def test_futures_not_implemented(self) -> None:
-        llm = DummyLLM()
-        llm.to(self.device)
-        tokenizer = DummyTokenizer()
-        fa = FeatureAblation(llm)
-        llm_fa = LLMAttribution(fa, tokenizer)
-        attributions = None
-        with self.assertRaises(NotImplementedError):
-            attributions = llm_fa.attribute_future()
-        self.assertEqual(attributions, None)
-
     def test_llm_attr_with_no_skip_tokens(self) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         fa = FeatureAblation(llm)
         llm_fa = LLMAttribution(fa, tokenizer)
 
-        inp = TextTokenInput("a b c", tokenizer)
-        res = llm_fa.attribute(
-            inp,
-            "m n o p q",
-            use_cached_outputs=self.use_cached_outputs,
-        )
+        inp = self._token_inp
+        with torch.inference_mode():
+            res = llm_fa.attribute(
+                inp,
+                "m n o p q",
+                use_cached_outputs=self.use_cached_outputs,
+            )
 
         # 5 output tokens, 4 input tokens including sos
         self.assertEqual(res.seq_attr.shape, (4,))
@@ -482,19 +611,39 @@ class TestLLMAttr(BaseTest):
         self.assertEqual(res.input_tokens, ["<sos>", "a", "b", "c"])
         self.assertEqual(res.output_tokens, ["<sos>", "m", "n", "o", "p", "q"])
 
+
+@parameterized_class(
+    ("device",), [("cpu",), ("cuda",)] if torch.cuda.is_available() else [("cpu",)]
+)
+class TestLLMAttrCacheInvariant(BaseTest):
+    # pyre-fixme[13]: Attribute `device` is never initialized.
+    device: str
+
+    def test_futures_not_implemented(self) -> None:
+        llm = DummyLLM()
+        llm.to(self.device)
+        tokenizer = _SHARED_TOKENIZER
+        fa = FeatureAblation(llm)
+        llm_fa = LLMAttribution(fa, tokenizer)
+        attributions = None
+        with self.assertRaises(NotImplementedError):
+            attributions = llm_fa.attribute_future()
+        self.assertEqual(attributions, None)
+
     def test_llm_attr_with_skip_tensor_target(self) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         fa = FeatureAblation(llm)
         llm_fa = LLMAttribution(fa, tokenizer)
 
         inp = TextTokenInput("a b c", tokenizer)
-        res = llm_fa.attribute(
-            inp,
-            torch.tensor(tokenizer.encode("m n o p q")),
-            skip_tokens=[0],
-        )
+        with torch.inference_mode():
+            res = llm_fa.attribute(
+                inp,
+                _MNOPQ_TARGET_IDS,
+                skip_tokens=[0],
+            )
 
         # 5 output tokens, 4 input tokens including sos
         self.assertEqual(res.seq_attr.shape, (4,))
@@ -505,6 +654,43 @@ class TestLLMAttr(BaseTest):
         self.assertEqual(res.input_tokens, ["<sos>", "a", "b", "c"])
         self.assertEqual(res.output_tokens, ["m", "n", "o", "p", "q"])
 
+    def test_dummy_llm_batched_input_with_shared_past_key_values(self) -> None:
+        llm = DummyLLM()
+        llm.to(self.device)
+        llm.eval()
+        tokenizer = _SHARED_TOKENIZER
+
+        prefix_ids = tokenizer.encode("a b", return_tensors="pt").to(self.device)
+        input_ids = torch.tensor(
+            [tokenizer.encode("c d", add_special_tokens=False)] * 2
+            + [tokenizer.encode("e f", add_special_tokens=False)],
+            device=self.device,
+        )
+        with torch.inference_mode():
+            past_key_values = llm(prefix_ids).past_key_values
+            batched = llm(input_ids, past_key_values=past_key_values)
+            per_row = [
+                llm(row.unsqueeze(0), past_key_values=past_key_values)
+                for row in input_ids
+            ]
+
+        # a one-row cached prefix is shared by every row of the batch
+        self.assertEqual(batched.logits.shape, (3, 5, tokenizer.vocab_size))
+        assertTensorAlmostEqual(
+            self,
+            batched.logits,
+            torch.cat([out.logits for out in per_row]),
+            delta=1e-5,
+            mode="max",
+        )
+        assertTensorAlmostEqual(
+            self,
+            batched.past_key_values,
+            torch.cat([out.past_key_values for out in per_row]),
+            delta=0.0,
+            mode="max",
+        )
+
 
 @parameterized_class(
     ("device",), [("cpu",), ("cuda",)] if torch.cuda.is_available() else [("cpu",)]
@@ -513,6 +699,16 @@ class TestLLMGradAttr(BaseTest):
     # pyre-fixme[13]: Attribute `device` is never initialized.
     device: str
 
+    def _baselines_to_device(self, baselines: Tuple[Tensor, ...]) -> Tuple[Tensor, ...]:
+        if self.device != "cuda":
+            return tuple(baseline.to(self.device) for baseline in baselines)
+        # copies from pinned memory do not block the host, and kernels queued
+        # later on the default stream still run after them
+        return tuple(
+            baseline.pin_memory().to(self.device, non_blocking=True)
+            for baseline in baselines
+        )
+
     @parameterized.expand(
         [
             (LayerIntegratedGradients, None),
@@ -525,15 +721,13 @@ class TestLLMGradAttr(BaseTest):
     ) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         attr = AttrClass(llm, llm.emb)  # type: ignore[call-arg]
         llm_attr = LLMGradientAttribution(attr, tokenizer)
 
         attr_kws: Dict[str, Any] = {}
         if baselines is not None:
-            attr_kws["baselines"] = tuple(
-                baseline.to(self.device) for baseline in baselines
-            )
+            attr_kws["baselines"] = self._baselines_to_device(baselines)
 
         inp = TextTokenInput("a b c", tokenizer)
         res = llm_attr.attribute(inp, "m n o p q", skip_tokens=[0], **attr_kws)
@@ -563,15 +757,13 @@ class TestLLMGradAttr(BaseTest):
     ) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         attr = AttrClass(llm, llm.emb)  # type: ignore[call-arg]
         llm_attr = LLMGradientAttribution(attr, tokenizer)
 
         attr_kws: Dict[str, Any] = {}
         if baselines is not None:
-            attr_kws["baselines"] = tuple(
-                baseline.to(self.device) for baseline in baselines
-            )
+            attr_kws["baselines"] = self._baselines_to_device(baselines)
 
         inp = TextTokenInput("a b c", tokenizer)
         res = llm_attr.attribute(inp, gen_args={"mock_response": "x y z"}, **attr_kws)
@@ -600,15 +792,13 @@ class TestLLMGradAttr(BaseTest):
     ) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         attr = AttrClass(llm, llm.emb)  # type: ignore[call-arg]
         llm_attr = LLMGradientAttribution(attr, tokenizer)
 
         attr_kws: Dict[str, Any] = {}
         if baselines is not None:
-            attr_kws["baselines"] = tuple(
-                baseline.to(self.device) for baseline in baselines
-            )
+            attr_kws["baselines"] = self._baselines_to_device(baselines)
 
         inp = TextTokenInput("a b c", tokenizer, skip_tokens=[0])
         res = llm_attr.attribute(inp, "m n o p q", skip_tokens=[0], **attr_kws)
@@ -629,7 +819,7 @@ class TestLLMGradAttr(BaseTest):
     def test_llm_attr_with_no_skip_tokens(self) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         attr = LayerIntegratedGradients(llm, llm.emb)  # type: ignore[call-arg]
         llm_attr = LLMGradientAttribution(attr, tokenizer)
 
@@ -649,7 +839,7 @@ class TestLLMGradAttr(BaseTest):
     def test_llm_attr_with_skip_tensor_target(self) -> None:
         llm = DummyLLM()
         llm.to(self.device)
-        tokenizer = DummyTokenizer()
+        tokenizer = _SHARED_TOKENIZER
         attr = LayerIntegratedGradients(llm, llm.emb)  # type: ignore[call-arg]
         llm_attr = LLMGradientAttribution(attr, tokenizer)
 
@@ -657,7 +847,7 @@ class TestLLMGradAttr(BaseTest):
         inp = TextTokenInput("a b c", tokenizer)
         res = llm_attr.attribute(
             inp,
-            torch.tensor(tokenizer.encode("m n o p q")),
+            _MNOPQ_TARGET_IDS,
             skip_tokens=[0],
             **attr_kws,
         )
@@ -672,6 +862,21 @@ class TestLLMGradAttr(BaseTest):
         self.assertEqual(res.output_tokens, ["m", "n", "o", "p", "q"])
 
 
+class _CompletionChoice(NamedTuple):
+    text: str
+
+
+class _PromptLogprobsChoice(NamedTuple):
+    prompt_logprobs: Optional[List[Dict[str, Dict[str, Any]]]]
+
+
+class _Completion(NamedTuple):
+    """Stands in for the completion response of the OpenAI client, only the
+    fields read by VLLMProvider are defined."""
+
+    choices: List[Union[_CompletionChoice, _PromptLogprobsChoice]]
+
+
 class TestVLLMProvider(BaseTest):
     """Test suite for VLLMProvider class."""
 
@@ -682,7 +887,7 @@ class TestVLLMProvider(BaseTest):
         self.input_prompt = "a b c d"
         self.target_str = "e f g h"
 
-        self.tokenizer = DummyTokenizer()
+        self.tokenizer = _SHARED_TOKENIZER
 
         # Set up patch for OpenAI import
         self.openai_patcher = patch("openai.OpenAI")
@@ -696,6 +901,14 @@ class TestVLLMProvider(BaseTest):
         self.openai_patcher.stop()
         super().tearDown()
 
+    def _set_mock_logprobs(
+        self, prompt_logprobs: Optional[List[Dict[str, Dict[str, Any]]]]
+    ) -> None:
+        """Make the mocked client respond with the given prompt_logprobs."""
+        self.mock_client.completions.create.return_value = _Completion(
+            choices=[_PromptLogprobsChoice(prompt_logprobs=prompt_logprobs)]
+        )
+
     def test_init_successful(self) -> None:
         """Test successful initialization of VLLMProvider."""
         model_name: str = "default-model"
@@ -755,11 +968,9 @@ class TestVLLMProvider(BaseTest):
     def test_generate_successful(self) -> None:
         """Test successful text generation."""
         # Set up mock response
-        mock_choice = MagicMock()
-        mock_choice.text = self.target_str
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choice]
-        self.mock_client.completions.create.return_value = mock_response
+        self.mock_client.completions.create.return_value = _Completion(
+            choices=[_CompletionChoice(text=self.target_str)]
+        )
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -779,11 +990,9 @@ class TestVLLMProvider(BaseTest):
     def test_generate_with_max_new_tokens(self) -> None:
         """Test generation with max_new_tokens parameter."""
         # Set up mock response
-        mock_choice = MagicMock()
-        mock_choice.text = self.target_str
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choice]
-        self.mock_client.completions.create.return_value = mock_response
+        self.mock_client.completions.create.return_value = _Completion(
+            choices=[_CompletionChoice(text=self.target_str)]
+        )
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -800,9 +1009,7 @@ class TestVLLMProvider(BaseTest):
     def test_generate_empty_choices(self) -> None:
         """Test generation when response has empty choices."""
         # Set up mock response with empty choices
-        mock_response = MagicMock()
-        mock_response.choices = []
-        self.mock_client.completions.create.return_value = mock_response
+        self.mock_client.completions.create.return_value = _Completion(choices=[])
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -839,7 +1046,6 @@ class TestVLLMProvider(BaseTest):
         input_token_ids = self.tokenizer.encode(
             self.input_prompt, add_special_tokens=False
         )
-        num_input_tokens = len(input_token_ids)
 
         target_token_ids = self.tokenizer.encode(
             self.target_str, add_special_tokens=False
@@ -847,38 +1053,23 @@ class TestVLLMProvider(BaseTest):
         expected_values = [0.1, 0.2, 0.3, 0.4]
         num_target_tokens = len(target_token_ids)
 
-        # Create mock vLLM response with prompt_logprobs
-        prompt_logprobs: List[Dict[str, Dict[str, Any]]] = []
-        for i in range(num_input_tokens):
-            token_probs = {
-                str(input_token_ids[i]): {
-                    "logprob": -0.5,  # fixed logprob for input tokens (for testing)
-                    "rank": i + 1,
-                    "decoded_token": self.tokenizer.convert_ids_to_tokens(
-                        input_token_ids[i]
-                    ),
-                }
-            }
-            prompt_logprobs.append(token_probs)
-        for i in range(num_target_tokens):
-            token_probs = {
-                str(target_token_ids[i]): {
-                    "logprob": expected_values[i],
-                    "rank": i + 1,
-                    "decoded_token": self.tokenizer.convert_ids_to_tokens(
-                        target_token_ids[i]
-                    ),
-                }
-            }
-            prompt_logprobs.append(token_probs)
+        # Create mock vLLM response with prompt_logprobs, input tokens get a fixed
+        # logprob (for testing) and target tokens the expected values
+        input_tokens = self.tokenizer.convert_ids_to_tokens(input_token_ids)
+        target_tokens = self.tokenizer.convert_ids_to_tokens(target_token_ids)
+        prompt_logprobs: List[Dict[str, Dict[str, Any]]] = [
+            {str(tid): {"logprob": -0.5, "rank": i + 1, "decoded_token": token}}
+            for i, (tid, token) in enumerate(zip(input_token_ids, input_tokens))
+        ] + [
+            {str(tid): {"logprob": logprob, "rank": i + 1, "decoded_token": token}}
+            for i, (tid, token, logprob) in enumerate(
+                zip(target_token_ids, target_tokens, expected_values)
+            )
+        ]
 
-        mock_choices = MagicMock()
         # prompt_logprobs will be of length
         # num_input_tokens + num_target_tokens
-        mock_choices.prompt_logprobs = prompt_logprobs
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choices]
-        self.mock_client.completions.create.return_value = mock_response
+        self._set_mock_logprobs(prompt_logprobs)
 
         # Create provider and call get_logprobs
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -921,11 +1112,7 @@ class TestVLLMProvider(BaseTest):
     def test_get_logprobs_missing_prompt_logprobs(self) -> None:
         """Test get_logprobs when response is missing prompt_logprobs."""
         # Set up mock response without prompt_logprobs
-        mock_choices = MagicMock()
-        mock_choices.prompt_logprobs = None
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choices]
-        self.mock_client.completions.create.return_value = mock_response
+        self._set_mock_logprobs(None)
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -944,11 +1131,7 @@ class TestVLLMProvider(BaseTest):
         prompt_logprobs: List[Dict[str, Dict[str, Any]]] = [
             {}
         ]  # Empty dict for token probabilities
-        mock_choices = MagicMock()
-        mock_choices.prompt_logprobs = prompt_logprobs
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choices]
-        self.mock_client.completions.create.return_value = mock_response
+        self._set_mock_logprobs(prompt_logprobs)
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -966,11 +1149,7 @@ class TestVLLMProvider(BaseTest):
             {"1": {"wrong_logprob_key": 0.1, "rank": 1, "decoded_token": "a"}},
             {"2": {"wrong_logprob_key": 0.2, "rank": 1, "decoded_token": "b"}},
         ]
-        mock_choices = MagicMock()
-        mock_choices.prompt_logprobs = prompt_logprobs
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choices]
-        self.mock_client.completions.create.return_value = mock_response
+        self._set_mock_logprobs(prompt_logprobs)
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -988,11 +1167,7 @@ class TestVLLMProvider(BaseTest):
         between expected and received tokens."""
         # Create mock response with only 1 logprobs (fewer than expected)
         prompt_logprobs = [{"1": {"logprob": 0.1, "rank": 1, "decoded_token": "a"}}]
-        mock_choices = MagicMock()
-        mock_choices.prompt_logprobs = prompt_logprobs
-        mock_response = MagicMock()
-        mock_response.choices = [mock_choices]
-        self.mock_client.completions.create.return_value = mock_response
+        self._set_mock_logprobs(prompt_logprobs)
 
         # Create provider
         provider = VLLMProvider(api_url=self.api_url, model_name=self.model_name)
@@ -1024,9 +1199,14 @@ class TestVLLMProvider(BaseTest):
 
 
 class DummyRemoteLLMProvider(RemoteLLMProvider):
+    __slots__ = ("api_url", "deterministic_logprobs", "_num_tokens_cache")
+
     def __init__(self, deterministic_logprobs: bool = False) -> None:
         self.api_url = "https://test-api.com"
         self.deterministic_logprobs = deterministic_logprobs
+        # number of tokens per (tokenizer id, text), sampling based methods
+        # score the same few perturbed prompts and target many times
+        self._num_tokens_cache: Dict[Tuple[int, str], int] = {}
 
     def generate(self, prompt: str, **gen_args: Any) -> str:
         assert (
@@ -1034,6 +1214,14 @@ class DummyRemoteLLMProvider(RemoteLLMProvider):
         ), "must mock response to use DummyRemoteLLMProvider to generate"
         return gen_args["mock_response"]
 
+    def _num_tokens(self, tokenizer: TokenizerLike, text: str) -> int:
+        key = (id(tokenizer), text)
+        num_tokens = self._num_tokens_cache.get(key)
+        if num_tokens is None:
+            num_tokens = len(tokenizer.encode(text, add_special_tokens=False))
+            self._num_tokens_cache[key] = num_tokens
+        return num_tokens
+
     def get_logprobs(
         self,
         input_prompt: str,
@@ -1042,32 +1230,29 @@ class DummyRemoteLLMProvider(RemoteLLMProvider):
     ) -> List[float]:
         assert tokenizer is not None, "Tokenizer is required"
         prompt = input_prompt + target_str
-        tokens = tokenizer.encode(prompt, add_special_tokens=False)
-        num_tokens = len(tokens)
-
-        num_target_str_tokens = len(
-            tokenizer.encode(target_str, add_special_tokens=False)
+        num_tokens = self._num_tokens(tokenizer, prompt)
+        num_target_str_tokens = self._num_tokens(tokenizer, target_str)
+
+        # Make sensitive to key features, the penalty only depends on the prompt
+        penalty = (
+            0.1 * ("a" not in prompt)
+            + 0.2 * ("c" not in prompt)
+            + 0.3 * ("d" not in prompt)
+            + 0.4 * ("f" not in prompt)
         )
 
-        logprobs = []
-
-        for i in range(num_tokens):
-            # Start with a base value
-            logprob = -0.1 - (0.01 * i)
-
-            # Make sensitive to key features
-            if "a" not in prompt:
-                logprob -= 0.1
-            if "c" not in prompt:
-                logprob -= 0.2
-            if "d" not in prompt:
-                logprob -= 0.3
-            if "f" not in prompt:
-                logprob -= 0.4
+        # Start with a base value, only the target tokens' logprobs are returned
+        return [
+            -0.1 - (0.01 * i) - penalty
+            for i in range(num_tokens)[-num_target_str_tokens:]
+        ]
 
-            logprobs.append(logprob)
 
-        return logprobs[-num_target_str_tokens:]
+# reference attributions of TestRemoteLLMAttr.test_remote_llm_attr, the same for
+# every method as the dummy provider's feature penalties are additive, and every
+# output token shares one row of token attributions
+_REMOTE_SEQ_ATTR = torch.tensor([0.5, 1.0, 1.5, 2.0])
+_REMOTE_TOK_ATTR = torch.tensor([0.1, 0.2, 0.3, 0.4]).expand(5, 4).contiguous()
 
 
 @parameterized_class(
@@ -1076,50 +1261,40 @@ class DummyRemoteLLMProvider(RemoteLLMProvider):
 class TestRemoteLLMAttr(BaseTest):
     # pyre-fixme[13]: Attribute `device` is never initialized.
     device: str
+    _prev_placeholder_device: Union[torch.device, str]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # placeholder_model is a singleton shared by every RemoteLLMAttribution,
+        # point it at the device of this parameterized class once for all tests
+        # and restore it afterwards so other test modules see the original
+        cls._prev_placeholder_device = RemoteLLMAttribution.placeholder_model.device
+        RemoteLLMAttribution.placeholder_model.device = cls.device
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        RemoteLLMAttribution.placeholder_model.device = cls._prev_placeholder_device
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tokenizer = _SHARED_TOKENIZER
+        self.provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
+        self.placeholder_model = RemoteLLMAttribution.placeholder_model
+
+    def _skip_sampling_on_cuda(self, n_samples: Optional[int]) -> None:
+        # attributions are computed from the provider's log probs on the host, so
+        # the cuda pass only adds coverage for device propagation, which the
+        # non-sampling cases already assert; skip the expensive sampling runs
+        if self.device == "cuda" and n_samples is not None:
+            self.skipTest("sampling-based attribution is device independent")
 
-    # pyre-fixme[56]: Pyre was not able to infer the type of argument
     @parameterized.expand(
         [
-            (
-                AttrClass,
-                delta,
-                n_samples,
-                torch.tensor(true_seq_attr),
-                torch.tensor(true_tok_attr),
-            )
-            for AttrClass, delta, n_samples, true_seq_attr, true_tok_attr in zip(
-                (FeatureAblation, ShapleyValueSampling, ShapleyValues),  # AttrClass
-                (0.001, 0.001, 0.001),  # delta
-                (None, 1000, None),  # n_samples
-                (  # true_seq_attr
-                    [0.5, 1.0, 1.5, 2.0],  # FeatureAblation
-                    [0.5, 1.0, 1.5, 2.0],  # ShapleyValueSampling
-                    [0.5, 1.0, 1.5, 2.0],  # ShapleyValues
-                ),
-                (  # true_tok_attr
-                    [  # FeatureAblation
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                    ],
-                    [  # ShapleyValueSampling
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                    ],
-                    [  # ShapleyValues
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                        [0.1, 0.2, 0.3, 0.4],
-                    ],
-                ),
-            )
+            (FeatureAblation, 0.001, None),
+            (ShapleyValueSampling, 0.001, 1000),
+            (ShapleyValues, 0.001, None),
         ]
     )
     def test_remote_llm_attr(
@@ -1127,23 +1302,17 @@ class TestRemoteLLMAttr(BaseTest):
         AttrClass: Type[PerturbationAttribution],
         delta: float,
         n_samples: Optional[int],
-        true_seq_attr: Tensor,
-        true_tok_attr: Tensor,
     ) -> None:
+        self._skip_sampling_on_cuda(n_samples)
         attr_kws: Dict[str, int] = {}
         if n_samples is not None:
             attr_kws["n_samples"] = n_samples
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        # attr_method = AttrClass(RemoteLLMAttribution.placeholder_model)
-        placeholder_model = RemoteLLMAttribution.placeholder_model
-        placeholder_model.device = self.device
-        attr_method = AttrClass(placeholder_model)
+        attr_method = AttrClass(self.placeholder_model)
         remote_llm_attr = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
         )
 
         # from TestLLMAttr
@@ -1159,40 +1328,37 @@ class TestRemoteLLMAttr(BaseTest):
             **attr_kws,  # type: ignore
         )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         self.assertEqual(res.seq_attr.shape, (4,))
-        self.assertEqual(cast(Tensor, res.token_attr).shape, (5, 4))
+        self.assertEqual(token_attr.shape, (5, 4))
         self.assertEqual(res.input_tokens, ["a", "c", "d", "f"])
         self.assertEqual(res.output_tokens, ["m", "n", "o", "p", "q"])
         self.assertEqual(res.seq_attr.device.type, self.device)
-        self.assertEqual(cast(Tensor, res.token_attr).device.type, self.device)
+        self.assertEqual(token_attr.device.type, self.device)
 
         assertTensorAlmostEqual(
             self,
             actual=res.seq_attr,
-            expected=true_seq_attr,
+            expected=_REMOTE_SEQ_ATTR,
             delta=delta,
             mode="max",
         )
         assertTensorAlmostEqual(
             self,
-            actual=res.token_attr,
-            expected=true_tok_attr,
+            actual=token_attr,
+            expected=_REMOTE_TOK_ATTR,
             delta=delta,
             mode="max",
         )
 
     def test_remote_llm_attr_without_target(self) -> None:
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        # attr_method = FeatureAblation(RemoteLLMAttribution.placeholder_model)
-        placeholder_model = RemoteLLMAttribution.placeholder_model
-        placeholder_model.device = self.device
-        attr_method = FeatureAblation(placeholder_model)
+        attr_method = FeatureAblation(self.placeholder_model)
         remote_llm_attr = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
         )
 
         # from TestLLMAttr
@@ -1203,22 +1369,22 @@ class TestRemoteLLMAttr(BaseTest):
             # use_cached_outputs=self.use_cached_outputs,
         )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         self.assertEqual(res.seq_attr.shape, (4,))
-        self.assertEqual(cast(Tensor, res.token_attr).shape, (3, 4))
+        self.assertEqual(token_attr.shape, (3, 4))
         self.assertEqual(res.input_tokens, ["a", "c", "d", "f"])
         self.assertEqual(res.output_tokens, ["x", "y", "z"])
         self.assertEqual(res.seq_attr.device.type, self.device)
-        self.assertEqual(cast(Tensor, res.token_attr).device.type, self.device)
+        self.assertEqual(token_attr.device.type, self.device)
 
     def test_remote_llm_attr_fa_log_prob(self) -> None:
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        attr_method = FeatureAblation(RemoteLLMAttribution.placeholder_model)
+        attr_method = FeatureAblation(self.placeholder_model)
         remote_llm_attr = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
             attr_target="log_prob",
         )
 
@@ -1231,9 +1397,11 @@ class TestRemoteLLMAttr(BaseTest):
             # use_cached_outputs=self.use_cached_outputs,
         )
 
+        token_attr = res.token_attr
+        assert token_attr is not None
         # With FeatureAblation, the seq attr in log_prob
         # equals to the sum of each token attr
-        assertTensorAlmostEqual(self, res.seq_attr, cast(Tensor, res.token_attr).sum(0))
+        assertTensorAlmostEqual(self, res.seq_attr, token_attr.sum(0))
 
     # pyre-fixme[56]: Pyre was not able to infer the type of argument
     @parameterized.expand(
@@ -1265,6 +1433,7 @@ class TestRemoteLLMAttr(BaseTest):
         true_seq_attr: Tensor,
         interpretable_model: Optional[nn.Module] = None,
     ) -> None:
+        self._skip_sampling_on_cuda(n_samples)
         init_kws = {}
         if interpretable_model is not None:
             init_kws["interpretable_model"] = interpretable_model
@@ -1272,16 +1441,11 @@ class TestRemoteLLMAttr(BaseTest):
         if n_samples is not None:
             attr_kws["n_samples"] = n_samples
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        # attr_method = AttrClass(RemoteLLMAttribution.placeholder_model, **init_kws)
-        placeholder_model = RemoteLLMAttribution.placeholder_model
-        placeholder_model.device = self.device
-        attr_method = AttrClass(placeholder_model, **init_kws)
+        attr_method = AttrClass(self.placeholder_model, **init_kws)
         remote_llm_attr = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
             attr_target="log_prob",
         )
 
@@ -1309,13 +1473,11 @@ class TestRemoteLLMAttr(BaseTest):
 
     def test_remote_llm_attr_futures_not_implemented(self) -> None:
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider()
-        attr_method = FeatureAblation(RemoteLLMAttribution.placeholder_model)
+        attr_method = FeatureAblation(self.placeholder_model)
         remote_llm_attr = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
         )
 
         # from TestLLMAttr
@@ -1326,17 +1488,15 @@ class TestRemoteLLMAttr(BaseTest):
 
     def test_remote_llm_attr_with_no_skip_tokens(self) -> None:
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        attr_method = FeatureAblation(RemoteLLMAttribution.placeholder_model)
+        attr_method = FeatureAblation(self.placeholder_model)
         remote_llm_fa = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
         )
 
         # from TestLLMAttr
-        inp = TextTokenInput("a b c", tokenizer)
+        inp = TextTokenInput("a b c", self.tokenizer)
         res = remote_llm_fa.attribute(inp, "m n o p q")
 
         # 5 output tokens, 4 input tokens including sos
@@ -1350,20 +1510,18 @@ class TestRemoteLLMAttr(BaseTest):
 
     def test_remote_llm_attr_with_skip_tensor_target(self) -> None:
 
-        tokenizer = DummyTokenizer()
-        provider = DummyRemoteLLMProvider(deterministic_logprobs=True)
-        attr_method = FeatureAblation(RemoteLLMAttribution.placeholder_model)
+        attr_method = FeatureAblation(self.placeholder_model)
         remote_llm_fa = RemoteLLMAttribution(
             attr_method=attr_method,
-            tokenizer=tokenizer,
-            provider=provider,
+            tokenizer=self.tokenizer,
+            provider=self.provider,
         )
 
         # from TestLLMAttr
-        inp = TextTokenInput("a b c", tokenizer)
+        inp = TextTokenInput("a b c", self.tokenizer)
         res = remote_llm_fa.attribute(
             inp,
-            torch.tensor(tokenizer.encode("m n o p q")),
+            _MNOPQ_TARGET_IDS,
             skip_tokens=[0],
         )
 
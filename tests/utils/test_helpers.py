@@ -4,7 +4,7 @@
 
 import torch
 from captum.testing.helpers import BaseTest
-from captum.testing.helpers.basic import assertTensorAlmostEqual
+from captum.testing.helpers.basic import assertTensorAlmostEqual, lcg, rand_like
 
 
 class HelpersTest(BaseTest):
@@ -51,9 +51,35 @@ class HelpersTest(BaseTest):
             ),
         )
 
+        with self.assertRaises(AssertionError) as cm:
+            assertTensorAlmostEqual(
+                self, torch.tensor([[1.0], [1.0]]), [[1.0], [0.0]], mode="max"
+            )
+        self.assertEqual(
+            cm.exception.args,
+            (
+                "Values at index 1, tensor([1.]) and tensor([0.]), differ more than by 0.0001",  # noqa: E501
+            ),
+        )
+
         assertTensorAlmostEqual(
             self, torch.tensor([[1.0, 1.0]]), [[1.0, 0.0]], delta=1.0
         )
 
         with self.assertRaises(AssertionError):
             assertTensorAlmostEqual(self, torch.tensor([[1.0, 1.0]]), [[1.0, 0.0]])
+
+    def test_rand_like(self) -> None:
+        g = lcg()
+        nums = [next(g) / (1 << 32) for _ in range(12)]
+
+        small = rand_like(torch.empty(2, 2))
+        assertTensorAlmostEqual(self, small, [nums[:2], nums[2:4]], delta=0.0)
+
+        # every call starts from the beginning of the same sequence
+        large = rand_like(torch.empty(3, 4, dtype=torch.float64))
+        self.assertEqual(large.dtype, torch.float64)
+        self.assertEqual(large.flatten().tolist(), nums)
+        large.zero_()
+        self.assertEqual(rand_like(large).flatten().tolist(), nums)
+        assertTensorAlmostEqual(self, rand_like(torch.empty(2, 2)), small, delta=0.0)